@@ -5,11 +5,13 @@ import sys
 import threading
 import time
 import concurrent.futures
+import itertools
 import netifaces
 import ipaddress
 import requests
 import nmap
-from typing import Dict, List, Tuple
+from collections import deque
+from typing import Deque, Dict, List, Tuple
 
 from rich.console import Console, Group
 from rich.layout import Layout
@@ -38,6 +40,10 @@ VERSION = "1.3"
 
 console = Console()
 
+def ip_sort_key(ip_address: str) -> int:
+    """Packs a dotted IPv4 address into an integer for fast numeric sorting."""
+    return int.from_bytes(socket.inet_aton(ip_address), "big")
+
 def discover_servers() -> List[str]:
     """Listens for server discovery broadcasts on the network."""
     discovered_servers = set()
@@ -70,8 +76,9 @@ def discover_servers() -> List[str]:
             # Listen for a few seconds
             sock.settimeout(DISCOVERY_TIMEOUT_S)
 
-            end_time = time.time() + DISCOVERY_TIMEOUT_S
-            while time.time() < end_time:
+            # Use a monotonic clock so wall-clock adjustments can't stretch or cut the window
+            end_time = time.monotonic() + DISCOVERY_TIMEOUT_S
+            while time.monotonic() < end_time:
                 try:
                     data, addr = sock.recvfrom(1024)
                     if data == DISCOVERY_MESSAGE:
@@ -82,7 +89,7 @@ def discover_servers() -> List[str]:
                     console.log(f"[red]Error during discovery: {e}[/red]")
                     break
         
-        server_list = sorted(list(discovered_servers))
+        server_list = sorted(discovered_servers, key=ip_sort_key)
     if server_list:
         console.print(f"[green]Found {len(server_list)} server(s): {', '.join(server_list)}[/green]")
     else:
@@ -311,7 +318,7 @@ def discover_lan_hosts() -> List[Tuple[str, str, str]]:
         console.log(f"[red]An error occurred during LAN host discovery: {e}[/red]")
         
     # Sort numerically
-    return sorted(lan_hosts, key=lambda item: tuple(map(int, item[0].split('.'))))
+    return sorted(lan_hosts, key=lambda item: ip_sort_key(item[0]))
 class ChatClient:
     """
     A TCP chat client with a rich, interactive command-line interface.
@@ -327,7 +334,8 @@ class ChatClient:
         self.is_rich_server: bool = False # Flag to track if the server supports ULIST
         self.client_socket: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.is_running: bool = False
-        self.chat_history: List[Text] = []
+        # A bounded deque so old messages are evicted in O(1) as new ones arrive
+        self.chat_history: Deque[Text] = deque(maxlen=2000)
         self._lock: threading.Lock = threading.Lock()
         self.initial_user_list_received = threading.Event()
 
@@ -368,19 +376,14 @@ class ChatClient:
     def _get_chat_panel(self) -> Panel:
         """Creates the chat history panel, respecting the scroll offset."""
         with self._lock:
-            # If scrolled, slice from the end of the list based on the offset.
-            if self.scroll_offset > 0:
-                end_index = len(self.chat_history) - self.scroll_offset
-                # Define a fixed window size for scrolled view
-                panel_height = console.height - 8
-                start_index = max(0, end_index - panel_height)
-                visible_history = self.chat_history[start_index:end_index]
-            # If at the bottom, just show the most recent messages.
-            # Slicing with a negative index is a robust way to get the last N items.
-            else:
-                # Display the last N messages, where N is the available space.
-                panel_height = console.height - 8
-                visible_history = self.chat_history[-panel_height:]
+            # Display N messages ending scroll_offset lines above the newest, where N
+            # is the available space. Walking back from the tail keeps this
+            # O(offset + N) instead of O(history) on every refresh.
+            panel_height = max(0, console.height - 8)
+            visible_history = list(itertools.islice(
+                reversed(self.chat_history), self.scroll_offset, self.scroll_offset + panel_height
+            ))
+            visible_history.reverse()
 
             chat_group = Group(*visible_history)
 
@@ -464,10 +467,6 @@ class ChatClient:
             self.scroll_offset = 0
             self.ui_dirty = True # Signal that the UI needs to be updated
 
-            # Optional: Trim history to prevent infinite growth
-            if len(self.chat_history) > 2000:
-                self.chat_history.pop(0)
-
 # client.py
     def _receive_messages(self) -> None:
         """
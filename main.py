@@ -13,6 +13,7 @@ from client import (
     discover_lan_hosts,
     get_local_ipv4_addresses,
     get_os_from_ip,
+    ip_sort_key,
     scan_and_probe_ports,
 )
 
@@ -83,7 +84,7 @@ if __name__ == "__main__":
         if discovered_devices:
             server_table.add_section()
             # Sort by IP address for consistent ordering
-            sorted_devices = sorted(discovered_devices.items(), key=lambda item: tuple(map(int, item[0].split('.'))))
+            sorted_devices = sorted(discovered_devices.items(), key=lambda item: ip_sort_key(item[0]))
             for ip, data in sorted_devices:
                 if ip not in selectable_ips:
                     device_info = Text(data["vendor"])
@@ -5,8 +5,9 @@ import sys
 import threading
 import time
 import netifaces
+import queue
 from collections import deque
-from typing import Deque, Dict, Tuple
+from typing import Deque, Dict, Optional, Tuple
 
 from rich.console import Console
 from rich.panel import Panel
@@ -21,6 +22,12 @@ DISCOVERY_MESSAGE = b"PYTHON_CHAT_SERVER_DISCOVERY_V1"
 BROADCAST_INTERVAL_S = 5
 # ---------------------------------- #
 
+# --- TCP Keepalive (dead peer detection) --- #
+KEEPALIVE_IDLE_S = 60
+KEEPALIVE_INTERVAL_S = 10
+KEEPALIVE_PROBES = 5
+# ------------------------------------------- #
+
 VERSION = '1.3'
 
 class ChatServer:
@@ -48,6 +55,9 @@ class ChatServer:
         self.message_history: Deque[str] = deque(maxlen=50)
         # A lock to ensure thread-safe access to shared resources
         self.lock: threading.RLock = threading.RLock()
+        # Per-client outbound queues, each drained by its own writer thread, so
+        # network I/O never happens while holding the lock
+        self.outboxes: Dict[socket.socket, "queue.Queue[Optional[str]]"] = {}
 
     def _broadcast(self, message: str, sender_socket: socket.socket = None) -> None:
         """
@@ -59,10 +69,11 @@ class ChatServer:
                                                      sent the message. If None,
                                                      sends to all clients.
         """
+        # Enqueue under the lock so every client receives broadcasts in the same order
         with self.lock:
-            for client_socket in list(self.clients):
+            for client_socket in self.clients:
                 if client_socket != sender_socket:
-                    self._send_direct_message(client_socket, message)
+                    self.outboxes[client_socket].put(message)
 
     def _broadcast_user_list(self) -> None:
         """Constructs and broadcasts the current user list to all clients."""
@@ -78,15 +89,43 @@ class ChatServer:
 
     def _send_direct_message(self, client_socket: socket.socket, message: str) -> bool:
         """
-        Sends a newline-terminated message directly to a single client.
-        Returns True on success, False on failure.
+        Queues a message for delivery to a single client.
+        Returns True if queued, False if the client has already been removed.
         """
-        try:
-            client_socket.sendall((message + '\n').encode('utf-8'))
+        with self.lock:
+            outbox = self.outboxes.get(client_socket)
+            if outbox is None:
+                return False
+            outbox.put(message)
             return True
-        except (socket.error, OSError):
+
+    def _write_to_client(self, client_socket: socket.socket, outbox: "queue.Queue[Optional[str]]") -> None:
+        """
+        Sends queued messages to a single client, in order, on a dedicated thread.
+
+        A None entry marks the client as removed. The writer owns the socket's
+        shutdown, so it is never closed while a write is in progress.
+
+        Args:
+            client_socket (socket.socket): The socket for the connected client.
+            outbox (queue.Queue): The client's outbound message queue.
+        """
+        try:
+            while True:
+                message = outbox.get()
+                if message is None:
+                    break
+                client_socket.sendall((message + '\n').encode('utf-8'))
+        except OSError:
             self._remove_client(client_socket)
-            return False
+        finally:
+            try:
+                # Wake the client's handler thread if it is blocked in recv
+                client_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client_socket.close()
+
     def _remove_client(self, client_socket: socket.socket) -> None:
         """
         Removes a client from the active connections.
@@ -97,15 +136,16 @@ class ChatServer:
             client_socket (socket.socket): The socket of the client to remove.
         """
         with self.lock:
-            if client_socket in self.clients:
-                address, username = self.clients[client_socket]
-                console.log(f"[bold red]Client {username} ({address}) has disconnected.[/bold red]")
-                del self.clients[client_socket]
-                client_socket.close()
-                # Notify remaining clients and log the event
-                notification = f"SRV|{username} has left the chat."
-                self._broadcast(notification)
-                self._broadcast_user_list()
+            if client_socket not in self.clients:
+                return
+            address, username = self.clients.pop(client_socket)
+            # Let the writer flush what is already queued, then close the socket
+            self.outboxes.pop(client_socket).put(None)
+            # Notify remaining clients and log the event
+            notification = f"SRV|{username} has left the chat."
+            self._broadcast(notification)
+            self._broadcast_user_list()
+        console.log(f"[bold red]Client {username} ({address}) has disconnected.[/bold red]")
 
     def _is_username_taken(self, username: str, requesting_socket: socket.socket) -> bool:
         """
@@ -125,6 +165,32 @@ class ChatServer:
                     return True
             return False
 
+    def _enable_keepalive(self, client_socket: socket.socket) -> None:
+        """
+        Enables TCP keepalive so the kernel eventually detects peers that vanished
+        without closing the connection, failing the handler's blocking recv.
+
+        The probe timings are tightened where the platform exposes them; otherwise
+        the OS defaults apply (typically the first probe after about 2 hours).
+
+        Args:
+            client_socket (socket.socket): The socket for the connected client.
+        """
+        client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option_name, value in (
+            ("TCP_KEEPIDLE", KEEPALIVE_IDLE_S),
+            ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL_S),
+            ("TCP_KEEPCNT", KEEPALIVE_PROBES),
+        ):
+            option = getattr(socket, option_name, None)
+            if option is None:
+                continue
+            try:
+                client_socket.setsockopt(socket.IPPROTO_TCP, option, value)
+            except OSError:
+                # Timing tweaks are best-effort; keepalive itself is already on
+                pass
+
     def _handle_client(self, client_socket: socket.socket, address: Tuple[str, int]) -> None:
         """
         Handles communication with a single client in a dedicated thread.
@@ -133,34 +199,36 @@ class ChatServer:
             client_socket (socket.socket): The socket for the connected client.
             address (Tuple[str, int]): The address tuple of the client.
         """
+        try:
+            self._enable_keepalive(client_socket)
+        except OSError:
+            # The peer already reset the connection (e.g. a port scanner)
+            client_socket.close()
+            return
+
         client_announced = False # Flag to prevent duplicate join messages
         addr_str = f"{address[0]}:{address[1]}"
         console.log(f"[bold green]New connection from {addr_str}.[/bold green]")
         
-        history_copy = []
+        outbox: "queue.Queue[Optional[str]]" = queue.Queue()
+        writer_thread = threading.Thread(target=self._write_to_client, args=(client_socket, outbox))
+        writer_thread.daemon = True
+
         with self.lock:
             username = f"User_{addr_str}"
             self.clients[client_socket] = (addr_str, username)
-            # Create a thread-safe copy of the history while locked
-            history_copy = list(self.message_history)
-
-        # Send welcome message and message history
-        if not self._send_direct_message(client_socket, "SRV|Welcome! Here are the recent messages:"):
-            return # Client disconnected
+            self.outboxes[client_socket] = outbox
+            # Queue the welcome message and history as a single write, then the
+            # current user list, while locked so no broadcast can slip in between
+            welcome_batch = "\n".join(["SRV|Welcome! Here are the recent messages:"] + list(self.message_history))
+            outbox.put(welcome_batch)
 
-        for msg in history_copy:
-            if not self._send_direct_message(client_socket, msg):
-                return # Client disconnected
-        
-        # --- FIX: Send the current user list directly to the new client ---
-        with self.lock:
+            # --- FIX: Send the current user list directly to the new client ---
             user_list_str = ",".join(
                 [f"{username}({addr})" for addr, username in self.clients.values()]
             )
-            initial_ulist_message = f"ULIST|{user_list_str}"
-        
-        if not self._send_direct_message(client_socket, initial_ulist_message):
-            return # Client disconnected
+            outbox.put(f"ULIST|{user_list_str}")
+        writer_thread.start()
 
         # Announce the new user to everyone else and send them the updated list
         join_notification = f"SRV|{username} has joined the chat."
@@ -193,6 +261,8 @@ class ChatServer:
                         old_username_local = ""
 
                         with self.lock:
+                            if client_socket not in self.clients:
+                                break # Removed by its writer thread after a failed send
                             old_username_local = self.clients[client_socket][1]
                             
                             if old_username_local.lower() == payload.lower():
@@ -254,6 +324,8 @@ class ChatServer:
                         new_username = message.split(' ', 1)[1].strip()
                         if new_username:
                             with self.lock:
+                                if client_socket not in self.clients:
+                                    break # Removed by its writer thread after a failed send
                                 old_username = self.clients[client_socket][1]
                             if old_username.lower() == new_username.lower():
                                 self._send_direct_message(client_socket, "SRV|Did you even change your name?")
@@ -261,6 +333,8 @@ class ChatServer:
                                 self._send_direct_message(client_socket, f"SRV|Nickname '{new_username}' is already taken.")
                             else:
                                 with self.lock:
+                                    if client_socket not in self.clients:
+                                        break # Don't re-register a client that was just removed
                                     self.clients[client_socket] = (addr_str, new_username)
                                     username = new_username
                                 notification = f"SRV|{old_username} is now known as {username}."
@@ -278,10 +352,14 @@ class ChatServer:
                             self.message_history.append(broadcast_message)
                         self._broadcast(broadcast_message, client_socket)
 
-        except (ConnectionResetError, BrokenPipeError, ConnectionAbortedError):
+        except (ConnectionResetError, BrokenPipeError, ConnectionAbortedError, TimeoutError):
             # This will now gracefully handle port scanners and clients that crash or disconnect abruptly.
             # We can use a less alarming, dimmed message for this type of closure.
             console.log(f"[dim]Connection with {username} ({addr_str}) closed abruptly.[/dim]")
+        except OSError as e:
+            # Stay quiet only if the writer thread already closed this socket after a failed send
+            if client_socket.fileno() != -1:
+                console.log(f"[dim]Connection with {username} ({addr_str}) closed abruptly: {e}[/dim]")
         finally:
             self._remove_client(client_socket)
 